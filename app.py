@@ -6,9 +6,12 @@ interface and regulates the frame updates. This class is composed of the followi
     2) update_boid_positions()
     3) update_goals()
     4) get_random_goal()
-    5) draw_window()
-    6) main()
-    7) print_results()
+    5) orbit()
+    6) paint_goals()
+    7) draw_window()
+    8) draw_renderer()
+    9) main()
+    10) print_results()
 
 Created on Sun Mar  6 11:13:47 2022
 
@@ -17,24 +20,45 @@ Created on Sun Mar  6 11:13:47 2022
 
 import math
 import pygame 
+import numpy as np
 import pandas as pd
+from pygame._sdl2 import Window, Renderer, Texture
 from boid import Boid
-from unity import Unity
+from unity import Unity, SpatialHash
 from goal import Goal
-from random import randint
+from random import randint, choice
 from datetime import datetime, timedelta
 
 
-FPS        = 60                                        # Defines the numnber of frames per second to run application at.
-X, Y       = 0,1                                       # Globals to denote the 'X' and 'Y' dimensions.
-BLACK      = (0,0,0)                                   # RGB color code for Black.
-WHITE      = (255,255,255)                             # RGB color code for White.
-WIDTH      = 1800                                      # Width of application screen. 
-HEIGHT     = 1000                                      # Height of application screen.
-WIN        = pygame.display.set_mode((WIDTH, HEIGHT))  # Global variable for application window.
-unities    = []                                        # A global list to hold all active unities in the application. 
-INIT_GOALS = 5                                         # The number of initial external components to start the application with. 
-goals      = [Goal() for _ in range(INIT_GOALS)]       # The global list that hold all external components in the application.
+FPS          = 60                                      # Defines the numnber of frames per second to run application at.
+SIM_RATE     = FPS                                     # Defines the number of simulation steps per second. The per-step constants are tuned for 60.
+MAX_STEPS    = 8                                       # The most simulation steps run between two frames before the simulation falls behind.
+USE_RENDERER = False                                   # Draw with the hardware accelerated pygame._sdl2 Renderer instead of the window surface.
+X, Y         = 0,1                                     # Globals to denote the 'X' and 'Y' dimensions.
+BLACK        = (0,0,0)                                 # RGB color code for Black.
+WHITE        = (255,255,255)                           # RGB color code for White.
+WIDTH        = 1800                                    # Width of application screen. 
+HEIGHT       = 1000                                    # Height of application screen.
+unities      = []                                      # A global list to hold all active unities in the application. 
+INIT_GOALS   = 5                                       # The number of initial external components to start the application with. 
+goals        = [Goal() for _ in range(INIT_GOALS)]     # The global list that hold all external components in the application.
+grid         = SpatialHash(Unity.SPACE)                # The global broad-phase grid of Boids, rebuilt every frame.
+dirty_rects  = []                                      # The areas of the window drawn on during the previous frame.
+painted      = []                                      # The external components currently painted onto the background.
+
+if USE_RENDERER:
+    pygame.display.init()
+    WINDOW         = Window("autopoiesis", size=(WIDTH, HEIGHT))            # Global variable for application window.
+    RENDERER       = Renderer(WINDOW, accelerated=1, vsync=True)             # The GPU renderer drawing to the window.
+    BOID_TEXTURE   = Texture.from_surface(RENDERER, Boid.BOID_SURFACE)      # The unrotated Boid image, rotated by the GPU per draw.
+    CIRCLE_SURFACE = pygame.Surface((128, 128), pygame.SRCALPHA)            # A white circle, tinted and scaled per draw.
+    pygame.draw.circle(CIRCLE_SURFACE, WHITE, (64, 64), 64)
+    CIRCLE_TEXTURE = Texture.from_surface(RENDERER, CIRCLE_SURFACE)
+else:
+    WIN            = pygame.display.set_mode((WIDTH, HEIGHT))               # Global variable for application window.
+    BACKGROUND     = pygame.Surface((WIDTH, HEIGHT)).convert()              # The window without unities, used to erase previous frames.
+    BACKGROUND.fill(BLACK)
+    Boid.convert_images()
 
 
 def self_reproduction(unity) -> None:
@@ -62,6 +86,10 @@ def update_boid_positions() -> None:
     This method calls the update and move method for each Boid in the unity 
     resulting in the x, y positions to be updated. Additional checks are
     performed to remove dead unities, or to trigger self-reproduction.
+    The spatial grid is rebuilt once beforehand so separation only needs
+    to consider nearby Boids, and each unity orbits after it has moved.
+    The rows of released Boids are only freed after every unity has been
+    updated, since freeing a row moves another Boid to a different row.
     
     Returns
     -------
@@ -69,13 +97,15 @@ def update_boid_positions() -> None:
         Updates Boid components in unties by reference.
 
     '''
+    unities[:] = [unity for unity in unities if unity.size() > 0]
+    grid.rebuild(unities)
     for unity in unities:
-        if unity.size() == 0:
-            unities.remove(unity)
         if unity.size() >= 20:
             self_reproduction(unity)
-        unity.update(unities)
+        unity.update(grid)
         unity.move(WIDTH, HEIGHT, goals)
+        orbit(unity)
+    Boid.POOL.flush()
 
 def update_goals() -> None:
     '''
@@ -105,38 +135,112 @@ def get_random_goal() -> Goal:
     Goal
          The next external component the unity should target.
     '''
-    return goals[randint(0, len(goals)-1)]
+    return choice(goals)
   
+def orbit(unity) -> None:
+    '''
+    This method advances the rotation of each Boid in the unity and moves
+    it along its trajectory around the barycenter, for the whole unity at once.
+
+    Parameters
+    ----------
+    unity : Unity
+        The Unity whose Boids should be rotated.
+
+    Returns
+    -------
+    None
+        Updates Boid components in the unity by reference.
+
+    '''
+    pool    = Boid.POOL
+    indices = unity.indices()
+    radians = (pool.radians[indices] + pool.angular[indices]) % (2*math.pi)
+    pool.radians[indices] = radians
+    pool.pos[indices] += np.column_stack((np.cos(radians), np.sin(radians))) * unity.radius
+
+def paint_goals() -> list:
+    '''
+    This method keeps the external components painted onto the background
+    surface, which is then used to erase the window. Components are only
+    repainted when one has been metabolised, added, or removed since the 
+    last frame, instead of being drawn to the window every frame.
+
+    Returns
+    -------
+    List of pygame.Rect
+        The areas of the background that have changed.
+
+    '''
+    removed = [goal for goal in painted if goal not in goals]
+    if not removed and len(painted) == len(goals) and not any(goal.dirty for goal in goals):
+        return []
+    changed = [BACKGROUND.fill(BLACK, (goal.circleX - goal.radius, goal.circleY - goal.radius,
+                                       goal.radius*2, goal.radius*2)) for goal in removed]
+    for goal in goals:
+        changed.append(pygame.draw.circle(BACKGROUND, goal.color(), (goal.circleX, goal.circleY), goal.radius))
+        goal.dirty = False
+    painted[:] = goals
+    return changed
+
 def draw_window() -> None:
     '''
     Returns
     -------
     None
             This method is responsible for updating the user interface via the pygame library. 
-            For every frame the window must be refilled with the background color, external 
-            components need to be updated, and the unity movements need to be displayed. .
+            For every frame the areas drawn on in the previous frame are erased with the
+            background, external components need to be updated, and the unity movements
+            need to be displayed. . The external components are part of the background,
+            the Boids of each unity are submitted in a single blits call after its
+            circle, and only the erased and newly drawn areas are updated.
+
+    '''
+    erased = dirty_rects + paint_goals()
+    WIN.blits([(BACKGROUND, rect, rect) for rect in erased], doreturn=False)
+    drawn = []
+    for unity in unities:
+        if unity.size() == 0: continue
+        drawn.append(pygame.draw.circle(WIN, WHITE, unity.boids[0].center.tolist(), unity.size()))
+        drawn.extend(WIN.blits([boid.rotate() for boid in unity.boids]))
+    pygame.display.update(erased + drawn)
+    dirty_rects[:] = drawn
+
+def draw_renderer() -> None:
+    '''
+    Returns
+    -------
+    None
+            This method is the draw_window counterpart for the hardware accelerated
+            renderer, used when USE_RENDERER is set. Circles are drawn by tinting and
+            scaling a single circle texture, and Boids are rotated by the GPU while
+            being copied, so no surfaces are created per frame.
 
     '''
-    WIN.fill(BLACK)
+    RENDERER.draw_color = pygame.Color(BLACK)
+    RENDERER.clear()
     for goal in goals:
-        pygame.draw.circle(WIN, goal.color(), (goal.circleX, goal.circleY), goal.radius)
+        CIRCLE_TEXTURE.color = goal.color()
+        CIRCLE_TEXTURE.draw(dstrect=(goal.circleX - goal.radius, goal.circleY - goal.radius,
+                                     goal.radius*2, goal.radius*2))
+    CIRCLE_TEXTURE.color = WHITE
     for unity in unities:
         if unity.size() == 0: continue
-        pygame.draw.circle(WIN, WHITE, (unity.boids[0].center[X], unity.boids[0].center[Y]), unity.size())
+        x, y = unity.boids[0].center.tolist()
+        CIRCLE_TEXTURE.draw(dstrect=(x - unity.size(), y - unity.size(), unity.size()*2, unity.size()*2))
         for boid in unity.boids:
-            boid.radians = (boid.radians + boid.angularV) % (2*math.pi)
-            boid.rect.x = (boid.rect.x) + math.cos(boid.radians) * unity.radius
-            boid.rect.y = (boid.rect.y) + math.sin(boid.radians) * unity.radius
-            rotated_boid, origin = boid.rotate()
-            WIN.blit(rotated_boid, origin)
-    pygame.display.update()
+            boid.draw(BOID_TEXTURE)
+    RENDERER.present()
     
 def main() -> None:
     '''
     This method is the main application loop that will run continuously
     until the set time limit has occured or a used quits the application. 
     The loop is responsible for regulating frames per second, managing 
-    update method calls, and handling application termination.
+    update method calls, and handling application termination. The
+    simulation runs in fixed steps of 1/SIM_RATE seconds for the time
+    that has passed, while a frame is only drawn once 1/FPS seconds have
+    passed, so a slow draw drops frames instead of slowing the simulation.
     
     Returns
     -------
@@ -147,20 +251,28 @@ def main() -> None:
     run = True
     end_time = datetime.now() + timedelta(minutes = 30)
     counter = 0
+    sim_accumulator    = 0.0
+    render_accumulator = 0.0
     unities.append(Unity(goal=get_random_goal()))
     while datetime.now() < end_time and run:
-        clock.tick(FPS)
-        if counter % 10 == 0 and counter <= 100:
-            unities[0].boids.append(Boid())
-            if counter == 100: 
-                Unity.PURSUE = True
-        counter = counter + 1
+        dt = clock.tick(SIM_RATE) / 1000
+        sim_accumulator    = min(sim_accumulator + dt, MAX_STEPS / SIM_RATE)
+        render_accumulator = render_accumulator + dt
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
-        update_goals()
-        update_boid_positions()       
-        draw_window()
+        while sim_accumulator >= 1 / SIM_RATE:
+            sim_accumulator -= 1 / SIM_RATE
+            if counter % 10 == 0 and counter <= 100:
+                unities[0].boids.append(Boid())
+                if counter == 100: 
+                    Unity.PURSUE = True
+            counter = counter + 1
+            update_goals()
+            update_boid_positions()
+        if render_accumulator >= 1 / FPS:
+            render_accumulator %= 1 / FPS
+            draw_renderer() if USE_RENDERER else draw_window()
     print_results()
     pygame.quit()
 
@@ -2,7 +2,8 @@
 """
 This class is the Boid class used to represent the individual
 boundary compontents. In this class there are helper functions
-and parameters used by the system.
+and parameters used by the system. The numeric state of every Boid
+is stored in a shared BoidPool so that it can be updated in bulk.
 
 Created on Mon Mar  7 14:18:26 2022
 
@@ -16,13 +17,193 @@ from random import random, randint
 
 X, Y = 0, 1
 
+class BoidPool():
+    '''
+    This class stores the state of every Boid as a structure of arrays. Each Boid
+    owns a single row of the contiguous arrays, which allows the organization rules
+    to be applied to a whole Unity with vectorized numpy operations instead of a
+    Python loop per Boid.
+    '''
+    
+    FIELDS = ("pos", "vel", "acc", "center", "health", "radians", "angular")  # The names of the pooled arrays.
+    
+    def __init__(self, capacity=64):
+        '''
+        The constructor function for the BoidPool class.
+
+        Parameters
+        ----------
+        capacity : Integer, optional
+            The number of rows to allocate up front. The pool doubles in size when full. The default is 64.
+
+        Returns
+        -------
+        None.
+
+        '''
+        self.count   = 0                                           # The number of live rows in the pool.
+        self.owners  = []                                          # The Boid that owns each live row.
+        self.pending = []                                          # The Boids whose rows are freed at the next flush.
+        self.pos     = np.zeros((capacity, 2), dtype=np.float32)  # The x, y position of each Boid.
+        self.vel     = np.zeros((capacity, 2), dtype=np.float32)  # The velocity of each Boid.
+        self.acc     = np.zeros((capacity, 2), dtype=np.float32)  # The acceleration of each Boid.
+        self.center  = np.zeros((capacity, 2), dtype=np.float32)  # The percieved barycenter of each Boid's unity.
+        self.health  = np.zeros(capacity, dtype=np.float32)       # The health of each Boid.
+        self.radians = np.zeros(capacity, dtype=np.float32)       # The rotation of each Boid.
+        self.angular = np.zeros(capacity, dtype=np.float32)       # The angular velocity of each Boid.
+
+    def acquire(self, boid):
+        '''
+        This method reserves the next free row of the pool for a Boid.
+
+        Parameters
+        ----------
+        boid : Boid
+            The Boid that will own the row.
+
+        Returns
+        -------
+        Integer
+            The index of the reserved row.
+
+        '''
+        if self.count == len(self.health):
+            for name in BoidPool.FIELDS:
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate((array, np.zeros_like(array))))
+        self.owners.append(boid)
+        self.count = self.count + 1
+        return self.count - 1
+
+    def release(self, index):
+        '''
+        This method frees a row of the pool by moving the last live row into
+        its place, keeping the live rows contiguous at the front of the arrays.
+
+        Parameters
+        ----------
+        index : Integer
+            The index of the row to free.
+
+        Returns
+        -------
+        None.
+
+        '''
+        last = self.count - 1
+        if index != last:
+            for name in BoidPool.FIELDS:
+                array = getattr(self, name)
+                array[index] = array[last]
+            moved = self.owners[last]
+            moved.index = index
+            self.owners[index] = moved
+        self.owners.pop()
+        self.count = last
+
+    def defer(self, boid):
+        '''
+        This method marks a Boid's row to be freed at the next flush. Freeing a
+        row moves another Boid into it, so rows are only freed once nothing
+        holds on to the pool indices of the current frame, such as the grid.
+
+        Parameters
+        ----------
+        boid : Boid
+            The Boid whose row should be freed.
+
+        Returns
+        -------
+        None.
+
+        '''
+        self.pending.append(boid)
+
+    def flush(self):
+        '''
+        This method frees the rows of every Boid passed to defer() since the
+        last flush.
+
+        Returns
+        -------
+        None.
+
+        '''
+        for boid in self.pending:
+            self.release(boid.index)
+        self.pending.clear()
+
+class PoolField():
+    '''
+    A descriptor that maps a Boid attribute onto the Boid's row of one of the
+    BoidPool arrays. Vector fields are returned as views, so item assignment
+    such as boid.velocity[X] = 0 writes straight through to the pool.
+    '''
+    
+    def __init__(self, name):
+        self.name = name
+    
+    def __get__(self, boid, owner=None):
+        if boid is None:
+            return self
+        return getattr(Boid.POOL, self.name)[boid.index]
+    
+    def __set__(self, boid, value):
+        getattr(Boid.POOL, self.name)[boid.index] = value
+
+def pre_rotate(image, pivot, step):
+    '''
+    This function renders an image rotated about a pivot point at every step
+    degrees, so that rotated images can be looked up rather than created
+    each frame.
+
+    Parameters
+    ----------
+    image : pygame.Surface
+        The unrotated image.
+    pivot : Tuple of Floats
+        The x, y point within the image to rotate about.
+    step : Integer
+        The angle in degrees between rotations.
+
+    Returns
+    -------
+    Tuple of (pygame.Surface, Tuple of Floats)
+        For each angle, the rotated image and the offset of its topleft corner from the pivot.
+
+    '''
+    width, height = image.get_size()
+    center_offset = pygame.math.Vector2(pivot[X] - width/2, pivot[Y] - height/2)
+    rotations = []
+    for angle in range(0, 360, step):
+        rotated = pygame.transform.rotate(image, angle)
+        offset  = center_offset.rotate(-angle)
+        rotations.append((rotated, (-offset.x - rotated.get_width()//2, -offset.y - rotated.get_height()//2)))
+    return tuple(rotations)
+
 class Boid():
     
     BOID_EXT_IMAGE = pygame.image.load(
         os.path.join("Assets", "exterior_boid.png"))  # The image path for the Boid design
     BOID_EXT_WIDTH, BOID_EXT_HEIGHT = 11, 30          # The pixel width and height of the Boid
     MAX_VEL = 2                                       # Maximum velocity for the Boids
-    MIN_VEL = np.array([0.5, 0.5])                    # Minimum velocity for the Boids
+    MIN_VEL = np.array([0.5, 0.5], dtype=np.float32)  # Minimum velocity for the Boids
+    MIN_VEL.flags.writeable = False                   # Shared by every Boid, so it must never be modified in place.
+    POOL = BoidPool()                                 # The shared storage for the state of every Boid.
+    ORIGIN_POS = (7.5, 20)                            # The pivot the Boid image is rotated about.
+    ROTATION_STEP = 4                                 # The angle in degrees between pre-rotated Boid images.
+    BOID_SURFACE = pygame.transform.rotate(           # The scaled and oriented Boid image shared by every Boid.
+                    pygame.transform.scale(BOID_EXT_IMAGE, (BOID_EXT_WIDTH, BOID_EXT_HEIGHT)), 180)
+    ROTATIONS = pre_rotate(                           # The Boid image pre-rotated to every ROTATION_STEP.
+                    BOID_SURFACE, ORIGIN_POS, ROTATION_STEP)
+    
+    position     = PoolField("pos")      # The current x, y position of the Boid.
+    velocity     = PoolField("vel")      # The current velocity of the Boid.
+    acceleration = PoolField("acc")      # The current accelelration of the Boid.
+    center       = PoolField("center")   # The percieved barycenter of the unity.
+    health       = PoolField("health")   # The current health of the Boid.
+    radians      = PoolField("radians")  # Current rotation of the Boid.
+    angularV     = PoolField("angular")  # The Angular velocity of the Boid
     
     def __init__(self, x=300, y=300):
         '''
@@ -40,68 +221,81 @@ class Boid():
         None.
 
         '''
-        self.velocity     = Boid.MIN_VEL              # The current velocity of the Boid
-        self.acceleration = np.array([0,0])           # The current accelelration of the Boid
-        self.angularV     = 0.07                      # The Angular velocity of the Boid
-        self.center       = np.array([x,y])           # The percieved barycenter of the unity.
-        self.radians      = random()                  # Current rotation of the Boid.
-        self.surface      = pygame.transform.rotate(  # The pygame surface to display the Boid.
-                            pygame.transform.scale(
-                                Boid.BOID_EXT_IMAGE, 
-                                (Boid.BOID_EXT_WIDTH, 
-                                 Boid.BOID_EXT_HEIGHT)),180)
-        self.rect         = pygame.Rect(x, y,         # The pygame rect class to position the Boid.
-                                        Boid.BOID_EXT_WIDTH, Boid.BOID_EXT_HEIGHT)
-        self.health       = randint(1000, 3000)       # The current health of the Boid.
+        self.index        = Boid.POOL.acquire(self)   # The row of the pool holding the Boid's state.
+        self.position     = (x, y)
+        self.velocity     = Boid.MIN_VEL              # Copied into the Boid's own row of the pool.
+        self.acceleration = (0, 0)
+        self.angularV     = 0.07
+        self.center       = (x, y)
+        self.radians      = random()
+        self.health       = randint(1000, 3000)
 
-    def get_position(self):
+    def release(self):
         '''
-        This method returns the current position of the Boid from the 
-        pygame rect class.
+        This method returns the Boid's row to the pool once the Boid is no
+        longer part of any unity. The row is freed when the pool is next
+        flushed, at the end of the frame.
 
         Returns
         -------
-        Numoy Array
-            Return the current x, y position of the Boid as a numpy array.
+        None.
 
         '''
-        return np.array([self.rect.x,self.rect.y])
-     
-    def limit_velocity(self):
+        Boid.POOL.defer(self)
+
+    @classmethod
+    def convert_images(cls):
         '''
-        THis method is responsible for delimiting the Boids velocity
-        to be within the maximum allowed velocity. 
+        This method converts the Boid image and its pre-rotated copies to the pixel 
+        format of the display so that blitting them takes the fast path. It can only
+        be called once the display mode has been set.
 
         Returns
         -------
         None.
 
         '''
-        if abs(self.velocity[X]) > Boid.MAX_VEL:
-            self.velocity[X] = (self.velocity[X] / abs(self.velocity[X])) * Boid.MAX_VEL
-        if abs(self.velocity[Y]) > Boid.MAX_VEL:
-            self.velocity[Y] = (self.velocity[Y] / abs(self.velocity[Y])) * Boid.MAX_VEL   
+        cls.BOID_SURFACE = cls.BOID_SURFACE.convert_alpha()
+        cls.ROTATIONS    = tuple((image.convert_alpha(), offset) for image, offset in cls.ROTATIONS)
 
     def rotate(self):
         '''
-        This method is responsible for manipulating the pygame classes, Rect and Surface, to 
-        display the Boid with the proper orientation given its currect trajectory
-        around the barycenter. 
+        This method is responsible for selecting the pre-rotated pygame Surface, and its
+        position, to display the Boid with the proper orientation given its currect
+        trajectory around the barycenter. 
 
         Returns
         -------
         rotated_image : pygame.Surface
-            A new pygame suface that has been orientated to match the Boid's trajeectory.
-        rotated_image_rect : pygame.Rect
-            A new pygame Rect that now contains the oriented x, and y coordinates.
-
-        '''
-        originPos = [7.5,20]
-        self.angle   = (self.radians * (180/math.pi) * -1) + 90
-        image_rect = self.surface.get_rect(topleft = (self.rect.x - originPos[X], self.rect.y-originPos[Y]))
-        offset_center_to_pivot = pygame.math.Vector2([self.rect.x, self.rect.y]) - image_rect.center
-        rotated_offset = offset_center_to_pivot.rotate(-self.angle)
-        rotated_image_center = (self.rect.x - rotated_offset.x, self.rect.y - rotated_offset.y)
-        rotated_image = pygame.transform.rotate(self.surface, self.angle)
-        rotated_image_rect = rotated_image.get_rect(center = rotated_image_center)
-        return rotated_image, rotated_image_rect
\ No newline at end of file
+            The pre-rotated pygame suface closest to the Boid's trajeectory.
+        rotated_image_pos : Tuple of Floats
+            The x, and y coordinates of the topleft corner of the oriented Boid.
+
+        '''
+        x, y = float(self.position[X]), float(self.position[Y])
+        self.angle = (float(self.radians) * (180/math.pi) * -1) + 90
+        rotated_image, offset = Boid.ROTATIONS[round(self.angle / Boid.ROTATION_STEP) % len(Boid.ROTATIONS)]
+        return rotated_image, (x + offset[X], y + offset[Y])
+
+    def draw(self, texture):
+        '''
+        This method is responsible for drawing the Boid with a pygame._sdl2 Texture, 
+        the hardware accelerated counterpart to rotate(). The renderer rotates the
+        texture about the Boid's pivot while copying it, so no rotated surface is
+        created.
+
+        Parameters
+        ----------
+        texture : pygame._sdl2.Texture
+            The texture of the unrotated Boid image.
+
+        Returns
+        -------
+        None.
+
+        '''
+        originPos = Boid.ORIGIN_POS
+        x, y = float(self.position[X]), float(self.position[Y])
+        self.angle = (float(self.radians) * (180/math.pi) * -1) + 90
+        texture.draw(dstrect=(x - originPos[X], y - originPos[Y], Boid.BOID_EXT_WIDTH, Boid.BOID_EXT_HEIGHT),
+                     angle=-self.angle, origin=originPos)
@@ -7,14 +7,19 @@ Created on Fri Mar 25 09:40:06 2022
 
 @author: Lawrence
 """
+import numpy as np
 from random import randint
 
 class Goal():
     def __init__(self):
-        self.circleX = randint(100,1500) # X coordinate of the external component
-        self.circleY = randint(100,800)  # Y coordinate of the external component
-        self.radius  = 10                # Radius of the external component
-        self.health  = 1000              # Initial health of the external component
+        self.circleX  = randint(100,1500) # X coordinate of the external component
+        self.circleY  = randint(100,800)  # Y coordinate of the external component
+        self.radius   = 10                # Radius of the external component
+        self.health   = 1000              # Initial health of the external component
+        self.position = np.array(         # The fixed X, Y coordinates of the external component as an array
+                            [self.circleX, self.circleY], dtype=np.float32)
+        self._color   = self.fade()       # The current color, recalculated only when the health changes
+        self.dirty    = True              # Whether the color has changed since the component was last drawn
         
     def hit(self):
         '''
@@ -27,12 +32,15 @@ class Goal():
 
         '''
         self.health -= 1
+        self._color = self.fade()
+        self.dirty  = True
         
     def color(self):
         '''
         This method returns the curent color of the external component which
         changes throughout the metabolic process. As the health of the external
         component decreases the color begins to fade and becomes darker. 
+        The color is only recalculated when the health changes.
 
         Returns
         -------
@@ -43,6 +51,19 @@ class Goal():
         b : Float
             RGD value for the blue.
 
+        '''
+        return self._color
+    
+    def fade(self):
+        '''
+        This method calculates the color of the external component for its
+        current health.
+
+        Returns
+        -------
+        Tuple of Floats
+            The r, g, b values of the color.
+
         '''
         r, g, b = max(0,0.1*self.health), max(0,0.2*self.health), max(0,0.1*self.health)
         return (r, g, b)
\ No newline at end of file
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+The Cython build of the separation kernel from unity_kernels. The loop over
+the Boids releases the GIL and runs in parallel with OpenMP. Build it in
+place with:
+
+    python setup.py build_ext --inplace
+
+unity_kernels uses this module when it has been built, and falls back to
+the Numba or numpy kernel otherwise.
+
+Created on Wed Oct 14 15:40:22 2026
+
+@author: Lawrence
+"""
+from cython.parallel import prange
+from libc.math cimport floor
+
+cdef inline void separate(float[:, ::1] pos, float[:, ::1] acc, Py_ssize_t i, long long[::1] starts,
+                          Py_ssize_t[::1] cells, long long[::1] origin, long long[::1] shape,
+                          double cell_size, float space_sq) noexcept nogil:
+    cdef float x = pos[i, 0]
+    cdef float y = pos[i, 1]
+    cdef float ax = 0, ay = 0, dx, dy
+    cdef long long cx = <long long>floor(x / cell_size) - origin[0]
+    cdef long long cy = <long long>floor(y / cell_size) - origin[1]
+    cdef long long gx, gy, cell, k
+    cdef Py_ssize_t j
+    for gy in range(cy - 1 if cy > 0 else 0, cy + 2 if cy + 2 < shape[1] else shape[1]):
+        for gx in range(cx - 1 if cx > 0 else 0, cx + 2 if cx + 2 < shape[0] else shape[0]):
+            cell = gy * shape[0] + gx
+            for k in range(starts[cell], starts[cell + 1]):
+                j = cells[k]
+                dx = pos[j, 0] - x
+                dy = pos[j, 1] - y
+                if dx*dx + dy*dy < space_sq:
+                    ax = ax - dx
+                    ay = ay - dy
+    acc[i, 0] = ax
+    acc[i, 1] = ay
+
+def separation(float[:, ::1] pos, float[:, ::1] acc, Py_ssize_t[::1] indices, long long[::1] starts,
+               Py_ssize_t[::1] cells, long long[::1] origin, long long[::1] shape, double cell_size, double space):
+    '''
+    This kernel computes the separation vector of each Boid and writes it into
+    the Boid's acceleration row. See unity_kernels for the parameters.
+
+    Returns
+    -------
+    None.
+
+    '''
+    cdef Py_ssize_t row
+    cdef float space_sq = space * space
+    for row in prange(indices.shape[0], nogil=True):
+        separate(pos, acc, indices[row], starts, cells, origin, shape, cell_size, space_sq)
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+Builds the optional Cython separation kernel in place:
+
+    python setup.py build_ext --inplace
+
+Created on Wed Oct 14 15:40:22 2026
+
+@author: Lawrence
+"""
+import sys
+from setuptools import setup, Extension
+from Cython.Build import cythonize
+
+OPENMP = "/openmp" if sys.platform == "win32" else "-fopenmp"  # The compiler flag enabling prange.
+
+setup(
+    name="autopoiesis",
+    ext_modules=cythonize(
+        [Extension("separation_kernel", ["separation_kernel.pyx"],
+                   extra_compile_args=[OPENMP],
+                   extra_link_args=[] if sys.platform == "win32" else [OPENMP])]),
+)
@@ -10,11 +10,73 @@ Created on Thu Mar 24 11:59:49 2022
 @author: Lawrence
 """
 import numpy as np
+import unity_kernels as kernels
 from boid import Boid
-from random import randint, random
+from random import choice
+from itertools import compress
 
 X, Y = 0,1
 
+class SpatialHash():
+    '''
+    A uniform grid used as the broad phase for Boid proximity queries. The grid
+    holds the pool index of every Boid, is rebuilt once per frame and is queried
+    by the 3x3 block of cells surrounding a position, so a Boid is only compared
+    against its close neighbours. The grid is stored flat, as the pool indices
+    sorted by cell plus the offset at which each cell begins, so that it can be
+    passed straight to the compiled kernels.
+    '''
+    
+    def __init__(self, cell_size):
+        '''
+        The constructor for the SpatialHash class.
+
+        Parameters
+        ----------
+        cell_size : Integer
+            The width and height of a single grid cell.
+
+        Returns
+        -------
+        None.
+
+        '''
+        self.cell_size = cell_size
+        self.origin    = np.zeros(2, dtype=np.int64)     # The (column, row) of the first grid cell.
+        self.shape     = np.ones(2, dtype=np.int64)      # The number of (columns, rows) in the grid.
+        self.starts    = np.zeros(2, dtype=np.int64)     # The offset into cells at which each grid cell begins.
+        self.cells     = np.zeros(0, dtype=np.intp)      # The pool indices of the Boids, ordered by grid cell.
+
+    def rebuild(self, unities):
+        '''
+        This method clears the grid and re-inserts every Boid from every Unity
+        using its current position.
+
+        Parameters
+        ----------
+        unities : List of Unity
+            All active Unities in the application.
+
+        Returns
+        -------
+        None.
+
+        '''
+        if not any(unity.size() for unity in unities):
+            self.origin = np.zeros(2, dtype=np.int64)
+            self.shape  = np.ones(2, dtype=np.int64)
+            self.starts = np.zeros(2, dtype=np.int64)
+            self.cells  = np.zeros(0, dtype=np.intp)
+            return
+        indices     = np.concatenate([unity.indices() for unity in unities])
+        keys        = np.floor(Boid.POOL.pos[indices] / self.cell_size).astype(np.int64)
+        self.origin = keys.min(axis=0)
+        self.shape  = keys.max(axis=0) - self.origin + 1
+        flat        = (keys[:, Y] - self.origin[Y]) * self.shape[X] + (keys[:, X] - self.origin[X])
+        self.cells  = indices[np.argsort(flat, kind="stable")]
+        self.starts = np.zeros(self.shape[X] * self.shape[Y] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(flat, minlength=self.starts.size - 1), out=self.starts[1:])
+
 class Unity():
     SPACE = 25                # The parameter used to determine allowable space amongst Boids.
     ACCELERATION_RATIO = 1/8  # The delimiter constant for Boid acceleration.
@@ -59,6 +121,19 @@ class Unity():
         '''
         return len(self.boids)
     
+    def indices(self):
+        '''
+        This method will return the rows of the Boid pool that hold the state
+        of the Boids in the unity.
+
+        Returns
+        -------
+        Numpy Array
+            An array of shape (size,) containing the pool index of each Boid.
+
+        '''
+        return np.fromiter((boid.index for boid in self.boids), dtype=np.intp, count=self.size())
+    
     def split(self):
         '''
         This method performs the self-reproduction process by splitting
@@ -74,6 +149,8 @@ class Unity():
         mid = self.size()//2
         np.random.shuffle(self.boids)
         boids = self.boids[mid+1:self.size()-1]
+        for boid in (self.boids[mid], self.boids[-1]):  # These Boids are left out of both halves.
+            boid.release()
         self.boids = self.boids[0:mid]
         self.radius = self.radius/2
         self.splits = self.splits + 1
@@ -81,113 +158,76 @@ class Unity():
             boid.velocity = boid.velocity/(i+1)
         return boids
 
-    def pursue(self, current_boid):
+    def separation(self, indices, grid):
         '''
         This method is responsible for the change in Boid velocity that will
-        result in the Boids minimizing the distance between their current 
-        position and the external component they are trying to consume.
+        result in the Boids steering away fromm one another if they space threshold
+        is breeched. The change is written into the Boids' acceleration in the pool,
+        where the remaining organization rules are added to it.
 
         Parameters
         ----------
-        current_boid : Boid
-            The current Boid being updated.
+        indices : Numpy Array
+            The pool indices of the Boids being updated.
+        grid : SpatialHash
+            The grid of all Boids across every Unity for the current frame.
 
         Returns
         -------
-        Numpy Array
-            An array of shape (2,) containing the change in velocity for X and Y.
+        None.
 
         '''
-        goal = np.array([self.goal.circleX, self.goal.circleY])
-        return (goal - current_boid.center)  / 40
+        pool = Boid.POOL
+        kernels.separation(pool.pos, pool.acc, indices, grid.starts, grid.cells,
+                           grid.origin, grid.shape, grid.cell_size, Unity.SPACE)
     
-    def cohesion(self, current_boid):
+    def check_obstacles(self, pos, indices):
         '''
-        This method is responsible for the change in Boid velocity that will
-        result in the Boids being pulled to the barycenter of the Unity to maintain
-        structural integrity.
+        This method is responsible for collision detection and collision physics.
+        When a Boid collides with an object its velocity is reduced and the trajectory
+        is altered away from the object. 
 
         Parameters
         ----------
-        current_boid : Boid
-            The current Boid being updated.
+        pos : Numpy Array
+            An array of shape (n, 2) containing the x, y coordinates the Boids are trying to move to.
+        indices : Numpy Array
+            The pool indices of the Boids being updated.
 
         Returns
         -------
         Numpy Array
-            An array of shape (2,) containing the change in velocity for X and Y.
+            An array of shape (n, 2) containing the x, y coordinates the Boids will move to.
 
         '''
-        if self.size() == 1:
-            return np.array([0,0])
-        
-        for boid in self.boids:
-            if boid != current_boid:
-                current_boid.center = current_boid.center + boid.get_position()
-        
-        current_boid.center =  current_boid.center / self.size() 
-    
-        vector = (current_boid.center - current_boid.get_position()) / 100
-        return vector
-    
-    def separation(self, current_boid, flocks):
-        '''
-        This method is responsible for the change in Boid velocity that will
-        result in the Boids steering away fromm one another if they space threshold
-        is breeched. 
+        hit = ((np.abs(pos[:, X] - self.goal.circleX) < self.goal.radius*2) & 
+               (np.abs(pos[:, Y] - self.goal.circleY) < self.goal.radius))
+        if hit.any():
+            pool = Boid.POOL
+            rows = indices[hit]
+            pos[hit] -= self.goal.position - pool.pos[rows]
+            pool.vel[rows] = -pool.vel[rows] * 0.1
 
-        Parameters
-        ----------
-        current_boid : Boid
-            The current Boid being updated.
+        return pos
 
-        Returns
-        -------
-        Numpy Array
-            An array of shape (2,) containing the change in velocity for X and Y.
-
-        '''
-        vector = np.array([0,0])
-        for flock in flocks:
-            for boid in flock.boids:
-                if boid != current_boid:
-                    position1 = current_boid.get_position()
-                    position2 = boid.get_position()
-                    if np.linalg.norm(position2 - position1) < Unity.SPACE:
-                        vector = vector - (position2 - position1)
-        return vector
-    
-    def check_obstacles(self,x,y,current_boid):
+    def retarget(self, goals):
         '''
-        This method is responsible for collision detection and collision physics.
-        When a Boid collides with an object its velocity is reduced and the trajectory
-        is altered away from the object. 
+        This method assigns a new external component for consumption if the
+        current one has already been metabolized by another Unity. It is called
+        once per frame before the Boids are moved.
 
         Parameters
         ----------
-        x : Float
-            The X coordinate the Boid is trying to move to.
-        y : Float
-            The Y coordinate the Boid is trying to move to.
-        current_boid : Boid
-            The current Boid being updated.
+        goals : List of Goals
+            All external components in the environment.
 
         Returns
         -------
-        Float
-            The x coordinate the Boid will move to.
-        TYPE
-            The y coordinate the Boid will move to.
+        None.
 
         '''
-        x_range  = range(self.goal.circleX - (self.goal.radius*2), self.goal.circleX + (self.goal.radius*2))
-        y_range  = range(self.goal.circleY - self.goal.radius, self.goal.circleY + self.goal.radius)
-        pos = np.array([x,y])
-        if x in x_range and y in y_range:
-            pos = np.array([x,y]) - (np.array([self.goal.circleX,self.goal.circleY]) - current_boid.get_position())
-            current_boid.velocity = -current_boid.velocity * 0.1
-
-        return pos[X], pos[Y]
+        if self.goal not in goals:
+            self.goal = choice(goals)
 
     def check_goal(self, current_boid, goals):
         '''
@@ -207,17 +247,11 @@ class Unity():
         None.
 
         '''
-        if self.goal not in goals:
-            self.goal = goals[randint(0, len(goals)-1)]
         radius = self.size()
-        center = np.array([int(current_boid.center[X]), int(current_boid.center[Y])])
-        x_range_center = list(range(center[X] - radius, center[X] + radius))
-        y_range_center = list(range(center[Y] - radius, center[Y] + radius))
+        center = (int(current_boid.center[X]), int(current_boid.center[Y]))
+        reach  = radius + self.goal.radius
         
-        x_range_goal  = list(range(self.goal.circleX - self.goal.radius, self.goal.circleX + self.goal.radius))
-        y_range_goal  = list(range(self.goal.circleY - self.goal.radius, self.goal.circleY + self.goal.radius))
-        
-        if any(x in x_range_goal for x in x_range_center) and any(y in y_range_goal for y in y_range_center):
+        if abs(center[X] - self.goal.circleX) < reach and abs(center[Y] - self.goal.circleY) < reach:
             self.goal.hit()
             if self.goal.health <= 250:
                 for _ in range(3):
@@ -227,82 +261,83 @@ class Unity():
                     goals.remove(self.goal)
                 except:
                     print("Goal has been taken already")
-                self.goal = goals[randint(0, len(goals)-1)]
+                self.goal = choice(goals)
                 self.metabolised = self.metabolised + 1
         
     
-    def update(self, unities=[]):
+    def update(self, grid):
         '''
         This method is used to update the velocity of all the Boids in the Unity. 
         The organization rules are used to calculate the change in velocity, and
-        the velocity is updated accordingly. 
+        the velocity is updated accordingly. Cohesion pulls the Boids to the
+        barycenter of the Unity to maintain structural integrity, separation
+        steers them apart, and pursue minimizes the distance to the external
+        component being consumed.
 
         Parameters
         ----------
-        unities : List of Unity, optional
-            List of all other Unities to allow for cross-unity collision perception. The default is [].
+        grid : SpatialHash
+            The grid of all Boids across every Unity to allow for cross-unity collision perception.
 
         Returns
         -------
         None.
 
         '''
-        for i, boid in enumerate(self.boids):
-            boid.health = boid.health - random()
-            if boid.health <= 0:
-                self.boids.pop(i)
-                self.radius = self.size()/2
-            v1 = self.cohesion(boid)
-            v2 = self.separation(boid, unities)
-            v3 = self.pursue(boid)
-            boid.acceleration = v1 + v2 + (Unity.PURSUE * v3)
-            boid.velocity = boid.velocity + boid.acceleration
-            boid.limit_velocity()
+        pool    = Boid.POOL
+        indices = self.indices()
+        pool.health[indices] -= np.random.random(self.size())
+        alive = pool.health[indices] > 0
+        if not alive.all():
+            for boid in compress(self.boids, ~alive):
+                boid.release()
+            self.boids  = list(compress(self.boids, alive))
+            self.radius = self.size()/2
+        if self.size() == 0:
+            return
+        indices = self.indices()
+        self.separation(indices, grid)
+        kernels.update_velocities(pool.pos, pool.vel, pool.acc, pool.center, indices,
+                                  self.goal.position, Unity.PURSUE, Boid.MAX_VEL)
     
-    def check_boundaries(self, x, y, width, height, current_boid):
+    def check_boundaries(self, pos, width, height, indices):
         '''
         This method is responsible for keeping all unity components within the
         pygame GUI. 
 
         Parameters
         ----------
-        x : Float
-            The x coordinate the current boid is attempting to move to.
-        y : Float
-            The y coordinate the current boid is attempting to move to.
+        pos : Numpy Array
+            An array of shape (n, 2) containing the x, y coordinates the Boids are attempting to move to.
         width : Integer
             The width of the application window for the GUI.
         height : Integer
             The height of the application window for the GUI..
-        current_boid : Boid
-            The current Boid being updated.
+        indices : Numpy Array
+            The pool indices of the Boids being updated.
 
         Returns
         -------
-        x : Float
-            The x coordinate the Boid will move to.
-        y : Float
-            The y coordinate the Boid will move to.
+        Numpy Array
+            An array of shape (n, 2) containing the x, y coordinates the Boids will move to.
 
         '''
-        if x < 0: 
-            x = 0
-            current_boid.velocity[X] = -current_boid.velocity[X]
-        if x > width - Boid.BOID_EXT_WIDTH:
-            x = width - Boid.BOID_EXT_WIDTH
-            current_boid.velocity[X] = -current_boid.velocity[X]
-        if y < 0:
-            y = 0
-            current_boid.velocity[y] = -current_boid.velocity[Y]
-        if y > height - Boid.BOID_EXT_HEIGHT:
-            y = height - Boid.BOID_EXT_HEIGHT  
-            current_boid.velocity[Y] = -current_boid.velocity[Y]
-        return x,y
+        limit   = np.array([width - Boid.BOID_EXT_WIDTH, height - Boid.BOID_EXT_HEIGHT], dtype=np.float32)
+        outside = (pos < 0) | (pos > limit)
+        if outside.any():
+            pool     = Boid.POOL
+            velocity = pool.vel[indices]
+            velocity[outside] = -velocity[outside]
+            pool.vel[indices] = velocity
+            np.clip(pos, 0, limit, out=pos)
+        return pos
     
     def move(self, width, height, goals):
         '''
         This method is responsible for the movement of the Boid components using
         the current Boid velocity. It utilizes other methods to validate movement. 
+        The new positions are calculated for the whole Unity at once, while the
+        goal is checked Boid by Boid since metabolizing it changes the goal.
 
         Parameters
         ----------
@@ -318,11 +353,12 @@ class Unity():
         None.
 
         '''
+        self.retarget(goals)
+        pool    = Boid.POOL
+        indices = self.indices()
+        pos     = pool.pos[indices] + pool.vel[indices]
+        pos     = self.check_obstacles(pos, indices)
+        pos     = self.check_boundaries(pos, width, height, indices)
         for boid in self.boids:
-            x   = boid.rect.x + boid.velocity[X]
-            y   = boid.rect.y + boid.velocity[Y]
-            x,y = self.check_obstacles(x, y, boid)
-            x,y = self.check_boundaries(x, y, width, height, boid)
             self.check_goal(boid, goals)
-            boid.rect.x = x
-            boid.rect.y = y
+        pool.pos[indices] = pos
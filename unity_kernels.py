@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+The numeric kernels behind the Unity organization rules. The kernels operate
+directly on the BoidPool arrays and the flattened SpatialHash grid, and are
+compiled with Numba when it is available. Setting USE_NUMBA to False (or
+NUMBA_DISABLE_JIT=1 in the environment) falls back to plain numpy versions
+of the same functions. When the Cython separation_kernel extension has been
+built (python setup.py build_ext --inplace) it is used for separation.
+
+Created on Wed Oct 14 09:12:41 2026
+
+@author: Lawrence
+"""
+import os
+import numpy as np
+
+USE_NUMBA = os.environ.get("NUMBA_DISABLE_JIT", "0") == "0"  # Whether to compile the kernels with Numba.
+
+if USE_NUMBA:
+    try:
+        from numba import njit, prange
+    except ImportError:
+        USE_NUMBA = False
+
+def _separation(pos, acc, indices, starts, cells, origin, shape, cell_size, space):
+    '''
+    This kernel computes the separation vector of each Boid by comparing it
+    against the Boids in the 3x3 block of grid cells surrounding it. The
+    vectors are written into the Boids' acceleration rows, where the other
+    organization rules are added to them, so no array is allocated.
+
+    Parameters
+    ----------
+    pos : Numpy Array
+        The pool positions of shape (capacity, 2).
+    acc : Numpy Array
+        The pool accelerations of shape (capacity, 2), updated in place.
+    indices : Numpy Array
+        The pool indices of the Boids being updated.
+    starts : Numpy Array
+        The offset into cells at which each grid cell begins, with one trailing entry.
+    cells : Numpy Array
+        The pool indices of every gridded Boid, ordered by grid cell.
+    origin : Numpy Array
+        The (column, row) of the first grid cell.
+    shape : Numpy Array
+        The number of (columns, rows) in the grid.
+    cell_size : Integer
+        The width and height of a single grid cell.
+    space : Integer
+        The allowable space amongst Boids.
+
+    Returns
+    -------
+    None.
+
+    '''
+    space_sq = space * space
+    for row in prange(len(indices)):
+        i = indices[row]
+        x, y = pos[i, 0], pos[i, 1]
+        ax, ay = 0.0, 0.0
+        cx = int(np.floor(x / cell_size)) - origin[0]
+        cy = int(np.floor(y / cell_size)) - origin[1]
+        for gy in range(max(cy - 1, 0), min(cy + 2, shape[1])):
+            for gx in range(max(cx - 1, 0), min(cx + 2, shape[0])):
+                cell = gy * shape[0] + gx
+                for k in range(starts[cell], starts[cell + 1]):
+                    j = cells[k]
+                    dx = pos[j, 0] - x
+                    dy = pos[j, 1] - y
+                    if dx*dx + dy*dy < space_sq:
+                        ax -= dx
+                        ay -= dy
+        acc[i, 0] = ax
+        acc[i, 1] = ay
+
+def _separation_numpy(pos, acc, indices, starts, cells, origin, shape, cell_size, space):
+    '''
+    This is the numpy counterpart of _separation, used when Numba is not
+    available. It takes the same parameters and writes the same separation
+    vectors into the acceleration rows, vectorizing over the neighbours of
+    each Boid instead of looping over them.
+
+    Returns
+    -------
+    None.
+
+    '''
+    acc[indices] = 0
+    keys = np.floor(pos[indices] / cell_size).astype(np.int64) - origin
+    for row, i in enumerate(indices):
+        cx, cy = keys[row]
+        neighbours = [cells[starts[gy*shape[0] + gx]:starts[gy*shape[0] + gx + 1]]
+                      for gy in range(max(cy - 1, 0), min(cy + 2, shape[1]))
+                      for gx in range(max(cx - 1, 0), min(cx + 2, shape[0]))]
+        if not neighbours:
+            continue
+        # The Boid itself is among its neighbours, but its zero offset does not contribute.
+        delta = pos[np.concatenate(neighbours)] - pos[i]
+        close = (delta**2).sum(axis=1) < space**2
+        acc[i] = -delta[close].sum(axis=0)
+
+def _update_velocities(pos, vel, acc, center, indices, goal, pursue, max_vel):
+    '''
+    This kernel applies the organization rules to the Boids of a Unity. Every
+    Boid's center is set to the barycenter of the Unity, and the cohesion and
+    pursue vectors are added to the separation vectors already held in the
+    acceleration, which is added to the velocity before the velocity is
+    limited to the maximum allowed velocity.
+
+    Parameters
+    ----------
+    pos, vel, acc, center : Numpy Array
+        The pool arrays of shape (capacity, 2). acc, vel and center are updated in place.
+    indices : Numpy Array
+        The pool indices of the Boids of the Unity.
+    goal : Numpy Array
+        The x, y position of the external component being pursued.
+    pursue : Boolean
+        Whether active assimilation is enabled.
+    max_vel : Float
+        The maximum velocity for the Boids.
+
+    Returns
+    -------
+    None.
+
+    '''
+    n = len(indices)
+    bx, by = 0.0, 0.0
+    for row in range(n):
+        bx += pos[indices[row], 0]
+        by += pos[indices[row], 1]
+    bx, by = bx / n, by / n
+    for row in prange(n):
+        i = indices[row]
+        center[i, 0] = bx
+        center[i, 1] = by
+        ax = acc[i, 0] + (bx - pos[i, 0]) / 100
+        ay = acc[i, 1] + (by - pos[i, 1]) / 100
+        if pursue:
+            ax += (goal[0] - bx) / 40
+            ay += (goal[1] - by) / 40
+        acc[i, 0] = ax
+        acc[i, 1] = ay
+        vel[i, 0] = min(max(vel[i, 0] + ax, -max_vel), max_vel)
+        vel[i, 1] = min(max(vel[i, 1] + ay, -max_vel), max_vel)
+
+def _update_velocities_numpy(pos, vel, acc, center, indices, goal, pursue, max_vel):
+    '''
+    This is the numpy counterpart of _update_velocities, used when Numba is
+    not available. It takes the same parameters and applies the same
+    organization rules to the whole Unity with array operations.
+
+    Returns
+    -------
+    None.
+
+    '''
+    p = pos[indices]
+    barycenter = p.mean(axis=0)
+    center[indices] = barycenter
+    acc[indices] += (barycenter - p) / 100 + (pursue * (goal - barycenter) / 40)
+    velocity = vel[indices] + acc[indices]
+    np.clip(velocity, -max_vel, max_vel, out=velocity)
+    vel[indices] = velocity
+
+if USE_NUMBA:
+    separation        = njit(cache=True, fastmath=True, parallel=True)(_separation)
+    update_velocities = njit(cache=True, fastmath=True, parallel=True)(_update_velocities)
+else:
+    separation        = _separation_numpy
+    update_velocities = _update_velocities_numpy
+
+try:
+    from separation_kernel import separation
+except ImportError:
+    pass